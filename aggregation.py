@@ -0,0 +1,56 @@
+import numpy as np # Importa NumPy, para agrupar los años en periodos de forma vectorizada.
+import pandas as pd # Importa Pandas, para construir las tablas de conteos que se grafican.
+
+from columnar_cache import values_dataframe # Lee los valores de la tabla Arrow de la caché directamente en un DataFrame.
+
+# --- Configuración de Periodos ---
+PERIOD_WIDTHS = {"year": 1, "decade": 10, "century": 100} # Ancho en años de cada tipo de periodo.
+PERIOD_LABELS = {"year": "Año", "decade": "Década", "century": "Siglo"} # Nombres de los periodos en la interfaz.
+
+# --- Funciones de Agregación ---
+
+def aggregates_to_dataframe(table):
+    """
+    Convierte la tabla Arrow de una consulta agregada (GROUP BY, ver run_sparql_table) en un DataFrame.
+    Las columnas 'period' y 'count' se convierten a enteros; las filas sin periodo se descartan.
+    """
+    df = values_dataframe(table) if table is not None else pd.DataFrame()
+    if df.empty or 'period' not in df.columns:
+        return pd.DataFrame(columns=['period', 'count'])
+    df['period'] = pd.to_numeric(df['period'], errors='coerce') # Wikidata puede devolver el periodo como decimal (ej. "1990.0").
+    df['count'] = pd.to_numeric(df['count'], errors='coerce').fillna(0).astype(int)
+    df = df.dropna(subset=['period'])
+    df['period'] = df['period'].astype(int)
+    if 'group' in df.columns: # Usa el IRI como etiqueta cuando el grupo no tiene etiqueta en español.
+        labels = df['groupLabel'] if 'groupLabel' in df.columns else pd.Series(None, index=df.index)
+        df['groupLabel'] = labels.fillna(df['group'].str.rsplit('/', n=1).str[-1])
+    return df.reset_index(drop=True)
+
+def extract_years(dates):
+    """
+    Extrae el año de una serie de fechas ISO 8601 (ej. "1941-07-05T00:00:00Z" o "-0500-01-01").
+    Se lee el texto directamente porque pd.to_datetime no admite fechas anteriores a 1677.
+    """
+    years = dates.astype('string').str.extract(r'^\s*(-?\d{1,6})', expand=False)
+    return pd.to_numeric(years, errors='coerce')
+
+def bin_events(df, date_column, period="decade", by=None):
+    """
+    Agrupa localmente los eventos de `df` por periodo de `date_column` (y opcionalmente por la columna `by`)
+    y devuelve un DataFrame con las columnas 'period', `by` y 'count'. Se usa cuando la agregación
+    en el endpoint no está disponible; los conteos solo cubren las filas de `df`, no el conjunto completo.
+    """
+    width = PERIOD_WIDTHS[period]
+    years = extract_years(df[date_column]).to_numpy(dtype=float)
+    valid = ~np.isnan(years) # Descarta los eventos sin fecha reconocible.
+    binned = pd.DataFrame({'period': (np.floor_divide(years[valid], width) * width).astype(int)})
+    keys = ['period']
+    if by: # Agrupación adicional (ej. por tipo o lugar).
+        binned[by] = df[by].to_numpy()[valid]
+        keys.append(by)
+    return binned.groupby(keys).size().reset_index(name='count').sort_values('period', ignore_index=True)
+
+def count_in_window(df_aggregates, start_year, end_year):
+    """Suma los conteos de los periodos que empiezan dentro de la ventana [start_year, end_year] (inclusive)."""
+    in_window = df_aggregates['period'].between(start_year, end_year)
+    return int(df_aggregates.loc[in_window, 'count'].sum())
@@ -6,6 +6,7 @@ import plotly.express as px # Importa Plotly Express, una librería para crear g
 import plotly.graph_objects as go # Importa Plotly Graph Objects, para construir gráficos más personalizados y complejos (ej. el gráfico de influencias).
 import datetime # Importa la librería datetime, para manejar y formatear fechas, esencial para las líneas de tiempo.
 import random # Importa random, usado para seleccionar un dato curioso aleatorio en la sección "Sabías que...".
+import io # Importa io, para generar en memoria los archivos que se ofrecen en el botón de descarga.
 
 
 # Importar las funciones de consulta SPARQL desde sparql_queries.py
@@ -16,8 +17,20 @@ from sparql_queries import ( # Importa funciones específicas de otro archivo pa
     get_global_wars_and_conflicts, # Función para obtener guerras y conflictos globales.
     get_unesco_world_heritage_sites, # Función para obtener sitios de Patrimonio Mundial de la UNESCO.
     get_influencer_relationships, # Función para obtener relaciones de influencia entre personalidades.
-    get_ecuadorian_musicians # Función para obtener músicos ecuatorianos.
+    get_ecuadorian_musicians, # Función para obtener músicos ecuatorianos.
+    get_historical_events_in_ecuador, # Función para obtener eventos históricos en Ecuador.
+    get_global_wars_aggregates, # Función para contar conflictos y guerras por periodo (agregación en el endpoint).
+    get_historical_events_aggregates # Función para contar eventos históricos por periodo y tipo o lugar.
 )
+from aggregation import ( # Funciones para preparar los conteos agregados que se grafican.
+    PERIOD_WIDTHS, # Ancho en años de cada periodo.
+    PERIOD_LABELS, # Nombre de cada periodo en la interfaz.
+    aggregates_to_dataframe, # Convierte un resultado agregado SPARQL en un DataFrame.
+    bin_events, # Agrupación local por periodo, usada si la agregación en el endpoint falla.
+    count_in_window # Número de elementos de una ventana de tiempo según los conteos.
+)
+from export_data import export_results # Función para exportar los resultados completos a CSV, Parquet o JSON-LD.
+from columnar_cache import value_rows # Lee las filas de la tabla en columnas de la caché sin reconstruir el JSON.
 
 # --- Configuración de la Página Streamlit ---
 # Configura el diseño de la página para que sea amplio y establece el título de la pestaña del navegador.
@@ -37,6 +50,7 @@ with st.sidebar: # Inicia un bloque de código para la barra lateral de Streamli
         "¿Qué quieres explorar?", # Pregunta mostrada al usuario.
         ("Inicio", # Opción para la pantalla de bienvenida.
          "Lugares", "Personalidades", "Músicos", # Opciones para diferentes categorías de datos.
+         "Eventos Históricos", # Opción para eventos históricos en Ecuador.
          "Conflictos/Guerras Globales", # Opción para conflictos y guerras.
          "Patrimonio de la Humanidad (UNESCO)", # Opción para sitios UNESCO.
          "Gráfico de Influencias") # Opción para el gráfico de influencias.
@@ -62,13 +76,16 @@ with st.sidebar: # Inicia un bloque de código para la barra lateral de Streamli
         search_term_musicians = st.text_input("Buscar músico por nombre o tema", "") # Campo de texto para buscar músicos.
     elif entity_type == "Conflictos/Guerras Globales": # Si el tipo de entidad es "Conflictos/Guerras Globales".
         search_term_global_conflicts = st.text_input("Buscar conflicto/guerra por nombre o tema", "") # Campo de texto para buscar conflictos.
-    elif entity_type in ["Personalidades"]: # Si el tipo de entidad es "Personalidades" o "Eventos Históricos".
+    elif entity_type in ["Personalidades", "Eventos Históricos"]: # Si el tipo de entidad es "Personalidades" o "Eventos Históricos".
         search_term_general = st.text_input("Buscar por nombre o tema", "") # Campo de texto para búsqueda general.
 
 # --- Contenido Principal de la Aplicación ---
 # Listas para almacenar los datos a mostrar y los datos para el mapa.
 data_to_display = [] # Lista para almacenar los datos procesados que se mostrarán en tablas o expanders.
 map_data = [] # Lista para almacenar datos geográficos para el mapa.
+results_table = None # Resultado completo de la sección actual en columnas (Arrow), usado para la exportación.
+rows = [] # Valores de cada fila del resultado, leídos de las columnas de la tabla, que recorren las secciones.
+DETAIL_LIMIT = 500 # Máximo de filas de detalle que se piden al acercar una ventana de tiempo.
 
 # Bloque condicional que determina qué contenido se mostrará en la aplicación principal
 # basándose en la selección del usuario en la barra lateral.
@@ -129,21 +146,22 @@ if entity_type == "Inicio": # Si el usuario ha seleccionado la opción "Inicio".
 elif entity_type == "Lugares": # Si el usuario ha seleccionado la opción "Lugares".
     st.markdown("Explora los lugares históricos más emblemáticos de Ecuador. Ubicados en un mapa interactivo, cada punto revela detalles sobre su historia y significado cultural.") # Descripción de la sección.
     # Llama a la función SPARQL para obtener datos de lugares.
-    results = get_monuments_or_places_in_ecuador(city=search_term_city) # Ejecuta la consulta SPARQL para lugares, filtrando por ciudad si se ingresó un término.
-    if results and results.get('results', {}).get('bindings'): # Verifica si la consulta devolvió resultados válidos.
-        for item in results['results']['bindings']: # Itera sobre cada resultado obtenido.
+    results_table = get_monuments_or_places_in_ecuador.table(city=search_term_city) # Ejecuta la consulta SPARQL para lugares, filtrando por ciudad si se ingresó un término.
+    rows = value_rows(results_table) # Lee los valores de cada fila directamente de las columnas de la tabla, sin pasar por JSON.
+    if rows: # Verifica si la consulta devolvió resultados válidos.
+        for item in rows: # Itera sobre cada resultado obtenido.
             try: # Intenta extraer los datos, manejando posibles errores de claves no existentes.
-                label = item['label']['value'] # Nombre del lugar.
-                abstract = item['abstract']['value'] # Descripción abstracta del lugar.
-                lat = float(item['lat']['value']) # Latitud del lugar, convertida a flotante.
-                long = float(item['long']['value']) # Longitud del lugar, convertida a flotante.
+                label = item['label'] # Nombre del lugar.
+                abstract = item['abstract'] # Descripción abstracta del lugar.
+                lat = float(item['lat']) # Latitud del lugar, convertida a flotante.
+                long = float(item['long']) # Longitud del lugar, convertida a flotante.
                 map_data.append({'name': label, 'lat': lat, 'lon': long}) # Agrega los datos del lugar a la lista para el mapa.
-                thumbnail_url = item.get('thumbnail', {}).get('value', 'https://upload.wikimedia.org/wikipedia/commons/a/ac/No_image_available.svg') # URL de la imagen en miniatura, con una imagen por defecto si no hay.
+                thumbnail_url = item.get('thumbnail', 'https://upload.wikimedia.org/wikipedia/commons/a/ac/No_image_available.svg') # URL de la imagen en miniatura, con una imagen por defecto si no hay.
                 data_to_display.append({ # Agrega los datos del lugar a la lista para mostrar.
                     "Tipo": "Lugar", # Tipo de entidad.
                     "Nombre": label, # Nombre del lugar.
                     "Descripción": abstract, # Descripción del lugar.
-                    "URL": item['place']['value'], # URL del recurso en la base de datos.
+                    "URL": item['place'], # URL del recurso en la base de datos.
                     "Latitud": lat, # Latitud.
                     "Longitud": long, # Longitud.
                     "Imagen": thumbnail_url # URL de la imagen.
@@ -156,15 +174,16 @@ elif entity_type == "Lugares": # Si el usuario ha seleccionado la opción "Lugar
 elif entity_type == "Personalidades": # Si el usuario ha seleccionado la opción "Personalidades".
     st.markdown("Descubre a las figuras más influyentes e importantes de la historia y cultura ecuatoriana. Conoce sus vidas, sus contribuciones y el impacto que tuvieron en nuestro país") # Descripción de la sección.
     # Llama a la función SPARQL para obtener datos de personalidades.
-    results = get_ecuadorian_personalities(search_term=search_term_general) # Ejecuta la consulta SPARQL para personalidades, con un término de búsqueda general.
-    if results and results.get('results', {}).get('bindings'): # Verifica si la consulta devolvió resultados.
-        for item in results['results']['bindings']: # Itera sobre cada resultado.
+    results_table = get_ecuadorian_personalities.table(search_term=search_term_general) # Ejecuta la consulta SPARQL para personalidades, con un término de búsqueda general.
+    rows = value_rows(results_table) # Lee los valores de cada fila directamente de las columnas de la tabla, sin pasar por JSON.
+    if rows: # Verifica si la consulta devolvió resultados.
+        for item in rows: # Itera sobre cada resultado.
             try: # Intenta extraer los datos.
-                label = item['personLabel']['value'] # Nombre de la personalidad.
-                description = item.get('description', {}).get('value', 'No hay descripción disponible.') # Descripción.
-                date_of_birth_raw = item.get('dateOfBirth', {}).get('value', 'Desconocido') # Fecha de nacimiento (sin formatear).
-                place_of_birth = item.get('placeOfBirthLabel', {}).get('value', 'Desconocido') # Lugar de nacimiento.
-                image_url = item.get('image', {}).get('value', None) # URL de la imagen.
+                label = item['personLabel'] # Nombre de la personalidad.
+                description = item.get('description', 'No hay descripción disponible.') # Descripción.
+                date_of_birth_raw = item.get('dateOfBirth', 'Desconocido') # Fecha de nacimiento (sin formatear).
+                place_of_birth = item.get('placeOfBirthLabel', 'Desconocido') # Lugar de nacimiento.
+                image_url = item.get('image', None) # URL de la imagen.
 
                 # Formatear la fecha de nacimiento para una mejor presentación.
                 formatted_date_of_birth = 'Desconocido' # Inicializa la fecha formateada.
@@ -181,7 +200,7 @@ elif entity_type == "Personalidades": # Si el usuario ha seleccionado la opción
                     "Descripción": description, # Descripción.
                     "Fecha de Nacimiento": formatted_date_of_birth, # Fecha de nacimiento formateada.
                     "Lugar de Nacimiento": place_of_birth, # Lugar de nacimiento.
-                    "URL": item['person']['value'], # URL del recurso.
+                    "URL": item['person'], # URL del recurso.
                     "Imagen": image_url # URL de la imagen.
                 })
             except KeyError: # Si ocurre un KeyError.
@@ -192,15 +211,16 @@ elif entity_type == "Personalidades": # Si el usuario ha seleccionado la opción
 elif entity_type == "Músicos": # Si el usuario ha seleccionado la opción "Músicos".
     st.markdown("Conoce a los artistas y compositores ecuatorianos que han dejado una huella imborrable en el panorama musical del país. Explora sus biografías y el legado de su arte.") # Descripción de la sección.
     # Llama a la función SPARQL para obtener datos de músicos ecuatorianos.
-    results = get_ecuadorian_musicians(search_term=search_term_musicians) # Ejecuta la consulta SPARQL para músicos.
-    if results and results.get('results', {}).get('bindings'): # Verifica si la consulta devolvió resultados.
-        for item in results['results']['bindings']: # Itera sobre cada resultado.
+    results_table = get_ecuadorian_musicians.table(search_term=search_term_musicians) # Ejecuta la consulta SPARQL para músicos.
+    rows = value_rows(results_table) # Lee los valores de cada fila directamente de las columnas de la tabla, sin pasar por JSON.
+    if rows: # Verifica si la consulta devolvió resultados.
+        for item in rows: # Itera sobre cada resultado.
             try: # Intenta extraer los datos.
-                label = item['musicianLabel']['value'] # Nombre del músico.
-                description = item.get('description', {}).get('value', 'No hay descripción disponible.') # Descripción.
-                date_of_birth_raw = item.get('dateOfBirth', {}).get('value', 'Desconocido') # Fecha de nacimiento (sin formatear).
-                place_of_birth = item.get('placeOfBirthLabel', {}).get('value', 'Desconocido') # Lugar de nacimiento.
-                image_url = item.get('image', {}).get('value', None) # URL de la imagen.
+                label = item['musicianLabel'] # Nombre del músico.
+                description = item.get('description', 'No hay descripción disponible.') # Descripción.
+                date_of_birth_raw = item.get('dateOfBirth', 'Desconocido') # Fecha de nacimiento (sin formatear).
+                place_of_birth = item.get('placeOfBirthLabel', 'Desconocido') # Lugar de nacimiento.
+                image_url = item.get('image', None) # URL de la imagen.
 
                 formatted_date_of_birth = 'Desconocido' # Inicializa la fecha formateada.
                 if date_of_birth_raw != 'Desconocido': # Si la fecha de nacimiento no es 'Desconocido'.
@@ -216,7 +236,7 @@ elif entity_type == "Músicos": # Si el usuario ha seleccionado la opción "Mús
                     "Descripción": description, # Descripción.
                     "Fecha de Nacimiento": formatted_date_of_birth, # Fecha de nacimiento formateada.
                     "Lugar de Nacimiento": place_of_birth, # Lugar de nacimiento.
-                    "URL": item['musician']['value'], # URL del recurso.
+                    "URL": item['musician'], # URL del recurso.
                     "Imagen": image_url # URL de la imagen.
                 })
             except KeyError: # Si ocurre un KeyError.
@@ -224,23 +244,140 @@ elif entity_type == "Músicos": # Si el usuario ha seleccionado la opción "Mús
     else: # Si no se encontraron resultados.
         st.info("No se encontraron músicos con los criterios seleccionados.") # Muestra un mensaje.
 
+elif entity_type == "Eventos Históricos": # Si el usuario ha seleccionado la opción "Eventos Históricos".
+    st.markdown("Recorre la historia de Ecuador a través de sus eventos: protestas, elecciones, conflictos y desastres naturales. Observa cómo se distribuyen en el tiempo y acércate a una época para conocer cada evento.") # Descripción de la sección.
+
+    # Vista general: conteos agregados en el endpoint, sin descargar cada evento.
+    period = st.radio("Agrupar por", list(PERIOD_WIDTHS), index=1, format_func=PERIOD_LABELS.get, horizontal=True, key="events_period") # Tamaño de los periodos.
+    df_types = aggregates_to_dataframe(get_historical_events_aggregates.table(search_term=search_term_general, period=period, group_by="type")) # Conteos por periodo y tipo.
+    start_year, end_year = None, None # Ventana de tiempo; None significa sin límite.
+    show_details = True # Si se descargan los elementos individuales (se desactiva mientras la ventana cubre todo el rango).
+    expected_count = None # Eventos de la ventana según la vista general (None si no hay ventana).
+
+    if not df_types.empty: # Si la agregación devolvió conteos.
+        fig = px.bar(df_types, x="period", y="count", color="groupLabel", # Histograma apilado por tipo de evento.
+                     labels={"period": PERIOD_LABELS[period], "count": "Eventos", "groupLabel": "Tipo"}, # Nombres de los ejes.
+                     title=f"Eventos Históricos en Ecuador por {PERIOD_LABELS[period]} y Tipo") # Título del gráfico.
+        st.plotly_chart(fig, use_container_width=True) # Muestra el histograma.
+
+        df_locations = aggregates_to_dataframe(get_historical_events_aggregates.table(search_term=search_term_general, period=period, group_by="location")) # Conteos por periodo y lugar.
+        if not df_locations.empty: # Si hay eventos con lugar.
+            df_top_locations = df_locations.groupby("groupLabel", as_index=False)["count"].sum().nlargest(15, "count") # Los 15 lugares con más eventos.
+            fig = px.bar(df_top_locations, x="count", y="groupLabel", orientation="h", # Barras horizontales por lugar.
+                         labels={"count": "Eventos", "groupLabel": "Lugar"}, # Nombres de los ejes.
+                         title="Lugares con más Eventos Históricos") # Título del gráfico.
+            fig.update_yaxes(autorange="reversed") # Muestra primero el lugar con más eventos.
+            st.plotly_chart(fig, use_container_width=True) # Muestra el gráfico de lugares.
+
+        first_period, last_period = int(df_types["period"].min()), int(df_types["period"].max()) # Primer y último periodo con eventos.
+        if first_period < last_period: # El slider necesita un rango no vacío.
+            # El slider avanza de periodo en periodo, así la ventana siempre coincide con barras completas del histograma.
+            window = st.slider(f"Acercar a una ventana de tiempo ({PERIOD_LABELS[period].lower()} inicial y final)", first_period, last_period, (first_period, last_period),
+                               step=PERIOD_WIDTHS[period], key=f"events_window_{period}") # Periodos elegidos.
+            if window != (first_period, last_period): # Solo se filtra (y se descargan los eventos) cuando el usuario acerca la ventana.
+                start_year, end_year = window[0], window[1] + PERIOD_WIDTHS[period] - 1 # Del primer año del periodo inicial al último del final.
+                expected_count = count_in_window(df_types, start_year, end_year) # Eventos de la ventana según el histograma.
+            else: # Con la ventana completa basta la vista general.
+                show_details = False
+                st.info("Acerca la ventana de tiempo para ver el detalle de los eventos.") # Indica cómo ver el detalle.
+
+    # Detalle: solo se descargan los eventos dentro de la ventana elegida.
+    if not show_details: # Mientras la ventana cubre todo el rango no se consulta el detalle.
+        results_table = None
+    elif expected_count is not None: # Con una ventana elegida se piden hasta DETAIL_LIMIT filas, no solo las 100 más recientes.
+        results_table = get_historical_events_in_ecuador.table(search_term=search_term_general, limit=DETAIL_LIMIT, start_year=start_year, end_year=end_year) # Ejecuta la consulta SPARQL para eventos.
+    else: # Sin vista general (la agregación falló) se usa la consulta de siempre.
+        results_table = get_historical_events_in_ecuador.table(search_term=search_term_general) # Ejecuta la consulta SPARQL para eventos.
+    rows = value_rows(results_table) # Lee los valores de cada fila directamente de las columnas de la tabla, sin pasar por JSON.
+    if rows: # Verifica si la consulta devolvió resultados.
+        event_dates = {} # Fecha original de cada evento (por URL, sin repetir), para la agrupación local de respaldo.
+        for item in rows: # Itera sobre cada resultado.
+            try: # Intenta extraer los datos.
+                label = item['eventLabel'] # Nombre del evento.
+                description = item.get('description', 'No hay descripción disponible.') # Descripción.
+                point_in_time_raw = item.get('pointInTime', 'Desconocido') # Fecha (sin formatear).
+                location = item.get('locationLabel', 'Desconocido') # Lugar.
+                image_url = item.get('image', None) # URL de la imagen.
+
+                formatted_date = point_in_time_raw # Inicializa la fecha formateada.
+                if point_in_time_raw != 'Desconocido': # Si la fecha no es 'Desconocido'.
+                    try: # Intenta formatear la fecha.
+                        formatted_date = datetime.datetime.fromisoformat(point_in_time_raw.replace('Z', '+00:00')).strftime('%d de %B de %Y') # Formatea la fecha.
+                    except ValueError: # Si ocurre un error de valor.
+                        pass # Mantiene el formato original.
+
+                event_dates.setdefault(item['event'], point_in_time_raw) # Guarda la fecha original.
+                data_to_display.append({ # Agrega los datos del evento a la lista para mostrar.
+                    "Tipo": "Evento Histórico", # Tipo de entidad.
+                    "Nombre": label, # Nombre.
+                    "Descripción": description, # Descripción.
+                    "Fecha": formatted_date, # Fecha formateada.
+                    "Lugar": location, # Lugar.
+                    "URL": item['event'], # URL del recurso.
+                    "Imagen": image_url # URL de la imagen.
+                })
+            except KeyError: # Si ocurre un KeyError.
+                continue # Continúa con el siguiente elemento.
+
+        if expected_count is not None and len(event_dates) < expected_count: # La consulta de detalle no trajo todos los eventos de la ventana.
+            st.warning(f"Mostrando {len(event_dates)} de {expected_count} eventos de esta ventana. Acerca más la ventana de tiempo para verlos todos.") # Avisa del recorte.
+
+        if df_types.empty and event_dates: # Si la agregación en el endpoint falló, agrupa localmente los eventos descargados.
+            df_binned = bin_events(pd.DataFrame({"Fecha": list(event_dates.values())}), "Fecha", period=period) # Conteos por periodo.
+            if not df_binned.empty: # Si algún evento tiene fecha reconocible.
+                fig = px.bar(df_binned, x="period", y="count", labels={"period": PERIOD_LABELS[period], "count": "Eventos"}, # Histograma local.
+                             title=f"Eventos Históricos en Ecuador por {PERIOD_LABELS[period]} (solo los {len(event_dates)} eventos cargados)") # El título aclara que no es el total.
+                st.plotly_chart(fig, use_container_width=True) # Muestra el histograma.
+    elif show_details: # Si no se encontraron resultados.
+        st.info("No se encontraron eventos históricos con los criterios seleccionados.") # Muestra un mensaje.
+
 elif entity_type == "Conflictos/Guerras Globales": # Si el usuario ha seleccionado la opción "Conflictos/Guerras Globales".
     st.markdown("Explora las guerras y conflictos más significativos a nivel mundial en una detallada línea de tiempo. Descubre información sobre su duración, los participantes y su contexto histórico global.") # Descripción de la sección.
-    # Llama a la función SPARQL para obtener datos de conflictos y guerras globales.
-    results = get_global_wars_and_conflicts(search_term=search_term_global_conflicts) # Ejecuta la consulta SPARQL para conflictos.
+
+    # Vista general: conteos por periodo agregados en el endpoint, sin descargar cada guerra.
+    period = st.radio("Agrupar por", list(PERIOD_WIDTHS), index=1, format_func=PERIOD_LABELS.get, horizontal=True, key="conflicts_period") # Tamaño de los periodos.
+    df_overview = aggregates_to_dataframe(get_global_wars_aggregates.table(search_term=search_term_global_conflicts, period=period)) # Conteos por periodo.
+    start_year, end_year = None, None # Ventana de tiempo; None significa sin límite.
+    show_details = True # Si se descargan los elementos individuales (se desactiva mientras la ventana cubre todo el rango).
+    expected_count = None # Conflictos de la ventana según la vista general (None si no hay ventana).
+
+    if not df_overview.empty: # Si la agregación devolvió conteos.
+        fig = px.bar(df_overview, x="period", y="count", labels={"period": PERIOD_LABELS[period], "count": "Conflictos"}, # Histograma de conflictos.
+                     title=f"Conflictos y Guerras Globales por {PERIOD_LABELS[period]} de Inicio") # Título del gráfico.
+        st.plotly_chart(fig, use_container_width=True) # Muestra el histograma.
+        first_period, last_period = int(df_overview["period"].min()), int(df_overview["period"].max()) # Primer y último periodo con conflictos.
+        if first_period < last_period: # El slider necesita un rango no vacío.
+            # El slider avanza de periodo en periodo, así la ventana siempre coincide con barras completas del histograma.
+            window = st.slider(f"Acercar a una ventana de tiempo ({PERIOD_LABELS[period].lower()} inicial y final)", first_period, last_period, (first_period, last_period),
+                               step=PERIOD_WIDTHS[period], key=f"conflicts_window_{period}") # Periodos elegidos.
+            if window != (first_period, last_period): # Solo se filtra (y se descargan los conflictos) cuando el usuario acerca la ventana.
+                start_year, end_year = window[0], window[1] + PERIOD_WIDTHS[period] - 1 # Del primer año del periodo inicial al último del final.
+                expected_count = count_in_window(df_overview, start_year, end_year) # Conflictos de la ventana según el histograma.
+            else: # Con la ventana completa basta la vista general.
+                show_details = False
+                st.info("Acerca la ventana de tiempo para ver el detalle de los conflictos.") # Indica cómo ver el detalle.
+
+    # Llama a la función SPARQL para obtener los conflictos dentro de la ventana elegida.
+    if not show_details: # Mientras la ventana cubre todo el rango no se consulta el detalle.
+        results_table = None
+    elif expected_count is not None: # Con una ventana elegida se piden hasta DETAIL_LIMIT filas, no solo las 50 más recientes.
+        results_table = get_global_wars_and_conflicts.table(search_term=search_term_global_conflicts, limit=DETAIL_LIMIT, start_year=start_year, end_year=end_year) # Ejecuta la consulta SPARQL para conflictos.
+    else: # Sin vista general (la agregación falló) se usa la consulta de siempre.
+        results_table = get_global_wars_and_conflicts.table(search_term=search_term_global_conflicts) # Ejecuta la consulta SPARQL para conflictos.
+    rows = value_rows(results_table) # Lee los valores de cada fila directamente de las columnas de la tabla, sin pasar por JSON.
     
     # Inicializa df_conflicts aquí, antes de usarla
     df_conflicts = pd.DataFrame() # Inicializa un DataFrame vacío para los conflictos. Esto es crucial para evitar 'NameError'.
 
-    if results and results.get('results', {}).get('bindings'): # Verifica si la consulta devolvió resultados.
-        for item in results['results']['bindings']: # Itera sobre cada resultado.
+    if rows: # Verifica si la consulta devolvió resultados.
+        for item in rows: # Itera sobre cada resultado.
             try: # Intenta extraer los datos.
-                label = item['eventLabel']['value'] # Nombre del evento.
-                description = item.get('description', {}).get('value', 'No hay descripción disponible.') # Descripción.
-                start_time_raw = item.get('startTime', {}).get('value', 'Desconocido') # Fecha de inicio (sin formatear).
-                end_time_raw = item.get('endTime', {}).get('value', start_time_raw) # Fecha de fin (sin formatear), usa la de inicio si no hay fin.
-                location = item.get('locationLabel', {}).get('value', 'Desconocido') # Ubicación.
-                image_url = item.get('image', {}).get('value', None) # URL de la imagen.
+                label = item['eventLabel'] # Nombre del evento.
+                description = item.get('description', 'No hay descripción disponible.') # Descripción.
+                start_time_raw = item.get('startTime', 'Desconocido') # Fecha de inicio (sin formatear).
+                end_time_raw = item.get('endTime', start_time_raw) # Fecha de fin (sin formatear), usa la de inicio si no hay fin.
+                location = item.get('locationLabel', 'Desconocido') # Ubicación.
+                image_url = item.get('image', None) # URL de la imagen.
 
                 start_date = 'Desconocido' # Inicializa la fecha de inicio formateada.
                 end_date = 'Desconocido' # Inicializa la fecha de fin formateada.
@@ -283,7 +420,7 @@ elif entity_type == "Conflictos/Guerras Globales": # Si el usuario ha selecciona
                         "start": start_date, # Fecha de inicio formateada para Plotly.
                         "end": end_date, # Fecha de fin formateada para Plotly.
                         "Lugar": location, # Lugar.
-                        "URL": item['event']['value'], # URL del recurso.
+                        "URL": item['event'], # URL del recurso.
                         "Imagen": image_url # URL de la imagen.
                     }])], ignore_index=True) # Ignora el índice para una concatenación limpia.
             except KeyError: # Si ocurre un KeyError.
@@ -294,6 +431,16 @@ elif entity_type == "Conflictos/Guerras Globales": # Si el usuario ha selecciona
             df_conflicts['end'] = pd.to_datetime(df_conflicts['end'], errors='coerce') # Convierte la columna 'end' a datetime.
             df_conflicts = df_conflicts.sort_values(by='start').dropna(subset=['start']) # Ordena por fecha de inicio y elimina filas sin fecha de inicio válida.
 
+            loaded_count = df_conflicts['URL'].nunique() # Conflictos distintos descargados (un conflicto puede ocupar varias filas).
+            if expected_count is not None and loaded_count < expected_count: # La consulta de detalle no trajo todos los conflictos de la ventana.
+                st.warning(f"Mostrando {loaded_count} de {expected_count} conflictos de esta ventana. Acerca más la ventana de tiempo para verlos todos.") # Avisa del recorte.
+
+            if df_overview.empty: # Si la agregación en el endpoint falló, agrupa localmente los conflictos descargados.
+                df_binned = bin_events(df_conflicts.drop_duplicates(subset='URL'), "Fecha de Inicio", period=period) # Conteos por periodo, un conflicto por URL.
+                fig = px.bar(df_binned, x="period", y="count", labels={"period": PERIOD_LABELS[period], "count": "Conflictos"}, # Histograma local.
+                             title=f"Conflictos y Guerras Globales por {PERIOD_LABELS[period]} de Inicio (solo los {loaded_count} conflictos cargados)") # El título aclara que no es el total.
+                st.plotly_chart(fig, use_container_width=True) # Muestra el histograma.
+
             # Crea una línea de tiempo interactiva para conflictos y guerras.
             fig = px.timeline(df_conflicts, x_start="start", x_end="end", y="Nombre", # Crea un gráfico de línea de tiempo con Plotly Express.
                               color="Tipo", # Colorea las barras por tipo.
@@ -305,20 +452,21 @@ elif entity_type == "Conflictos/Guerras Globales": # Si el usuario ha selecciona
             data_to_display = df_conflicts.to_dict('records') # Convierte el DataFrame de conflictos a una lista de diccionarios para mostrar en otros lugares.
         else: # Si df_conflicts está vacío.
             st.info("No se encontraron conflictos o guerras globales con los criterios seleccionados.") # Muestra un mensaje.
-    else: # Si la consulta SPARQL no devolvió resultados iniciales.
+    elif show_details: # Si la consulta SPARQL no devolvió resultados iniciales.
         st.info("No se encontraron conflictos o guerras globales con los criterios seleccionados.") # Muestra un mensaje.
 
 elif entity_type == "Patrimonio de la Humanidad (UNESCO)": # Si el usuario ha seleccionado la opción "Patrimonio de la Humanidad (UNESCO)".
     st.markdown("Descubre los sitios declarados Patrimonio de la Humanidad por la UNESCO, tanto en Ecuador como alrededor del mundo. Conoce estos tesoros culturales y naturales con imágenes y descripciones") # Descripción de la sección.
     # Llama a la función SPARQL para obtener datos de sitios UNESCO.
-    results = get_unesco_world_heritage_sites(search_term=search_term_unesco) # Ejecuta la consulta SPARQL para sitios UNESCO.
-    if results and results.get('results', {}).get('bindings'): # Verifica si la consulta devolvió resultados.
-        for item in results['results']['bindings']: # Itera sobre cada resultado.
+    results_table = get_unesco_world_heritage_sites.table(search_term=search_term_unesco) # Ejecuta la consulta SPARQL para sitios UNESCO.
+    rows = value_rows(results_table) # Lee los valores de cada fila directamente de las columnas de la tabla, sin pasar por JSON.
+    if rows: # Verifica si la consulta devolvió resultados.
+        for item in rows: # Itera sobre cada resultado.
             try: # Intenta extraer los datos.
-                label = item['siteLabel']['value'] # Nombre del sitio.
-                description = item.get('description', {}).get('value', 'No hay descripción disponible.') # Descripción.
-                image_url = item.get('image', {}).get('value', 'https://upload.wikimedia.org/wikipedia/commons/a/ac/No_image_available.svg') # URL de la imagen.
-                coords_raw = item.get('coords', {}).get('value', None) # Coordenadas geográficas (en formato crudo).
+                label = item['siteLabel'] # Nombre del sitio.
+                description = item.get('description', 'No hay descripción disponible.') # Descripción.
+                image_url = item.get('image', 'https://upload.wikimedia.org/wikipedia/commons/a/ac/No_image_available.svg') # URL de la imagen.
+                coords_raw = item.get('coords', None) # Coordenadas geográficas (en formato crudo).
                 
                 lat, long = None, None # Inicializa latitud y longitud.
                 if coords_raw: # Si hay coordenadas.
@@ -333,7 +481,7 @@ elif entity_type == "Patrimonio de la Humanidad (UNESCO)": # Si el usuario ha se
                     "Tipo": "Patrimonio UNESCO", # Tipo de entidad.
                     "Nombre": label, # Nombre.
                     "Descripción": description, # Descripción.
-                    "URL": item['site']['value'], # URL del recurso.
+                    "URL": item['site'], # URL del recurso.
                     "Imagen": image_url, # URL de la imagen.
                     "Latitud": lat, # Latitud.
                     "Longitud": long # Longitud.
@@ -364,14 +512,15 @@ elif entity_type == "Gráfico de Influencias": # Si el usuario ha seleccionado l
     st.info("Explora cómo diferentes personalidades se han influenciado mutuamente.") # Mensaje informativo.
     
     # Llama a la función SPARQL para obtener relaciones de influencia.
-    results = get_influencer_relationships(limit=50) # Ejecuta la consulta SPARQL para relaciones de influencia, limitando los resultados a 50.
-    if results and results.get('results', {}).get('bindings'): # Verifica si la consulta devolvió resultados.
+    results_table = get_influencer_relationships.table(limit=50) # Ejecuta la consulta SPARQL para relaciones de influencia, limitando los resultados a 50.
+    rows = value_rows(results_table) # Lee los valores de cada fila directamente de las columnas de la tabla, sin pasar por JSON.
+    if rows: # Verifica si la consulta devolvió resultados.
         nodes = set() # Conjunto para almacenar nombres únicos de personalidades (nodos del gráfico).
         edges = [] # Lista para almacenar las relaciones de influencia (aristas del gráfico).
         data_to_display = [] # Lista para los datos detallados.
-        for item in results['results']['bindings']: # Itera sobre cada relación de influencia.
-            influencer_label = item['influencerLabel']['value'] # Nombre del influyente.
-            influenced_label = item['influencedLabel']['value'] # Nombre del influenciado.
+        for item in rows: # Itera sobre cada relación de influencia.
+            influencer_label = item['influencerLabel'] # Nombre del influyente.
+            influenced_label = item['influencedLabel'] # Nombre del influenciado.
             
             nodes.add(influencer_label) # Agrega el influyente al conjunto de nodos.
             nodes.add(influenced_label) # Agrega el influenciado al conjunto de nodos.
@@ -381,13 +530,13 @@ elif entity_type == "Gráfico de Influencias": # Si el usuario ha seleccionado l
                 "Tipo": "Influencer", # Tipo.
                 "Nombre": influencer_label, # Nombre.
                 "Descripción": f"Influenció a {influenced_label}.", # Descripción.
-                "URL": item['influencer']['value'] # URL del influyente.
+                "URL": item['influencer'] # URL del influyente.
             })
             data_to_display.append({ # Agrega los datos del influenciado a la lista para mostrar.
                 "Tipo": "Influenciado", # Tipo.
                 "Nombre": influenced_label, # Nombre.
                 "Descripción": f"Fue influenciado por {influencer_label}.", # Descripción.
-                "URL": item['influenced']['value'] # URL del influenciado.
+                "URL": item['influenced'] # URL del influenciado.
             })
 
         df_nodes = pd.DataFrame(list(nodes), columns=['name']) # Crea un DataFrame de Pandas con los nombres de los nodos.
@@ -473,15 +622,42 @@ if data_to_display and entity_type not in ["Inicio", "Conflictos/Guerras Globale
                     st.write(f"**Fecha de Nacimiento:** {item['Fecha de Nacimiento']}") # Muestra la fecha de nacimiento.
                     st.write(f"**Lugar de Nacimiento:** {item['Lugar de Nacimiento']}") # Muestra el lugar de nacimiento.
                     st.markdown(f"[Más información en Wikidata]({item['URL']})") # Enlace a Wikidata.
+                elif item['Tipo'] == "Evento Histórico": # Si es un evento histórico.
+                    st.write(f"**Fecha:** {item['Fecha']} | **Lugar:** {item['Lugar']}") # Muestra la fecha y el lugar.
+                    st.markdown(f"[Más información en Wikidata]({item['URL']})") # Enlace a Wikidata.
                 elif item['Tipo'] == "Lugar": # Si es un lugar.
                     st.write(f"**Latitud:** {item['Latitud']} | **Longitud:** {item['Longitud']}") # Muestra latitud y longitud.
                     st.markdown(f"[Más información en DBpedia]({item['URL']})") # Enlace a DBpedia.
                 elif item['Tipo'] in ["Influencer", "Influenciado"]: # Si es un influencer o influenciado.
                     st.markdown(f"[Más información]({item['URL']})") # Enlace de información adicional.
 else: # Si no hay datos para mostrar o el tipo de entidad está excluido.
-    if entity_type != "Inicio" and not map_data and entity_type not in ["Conflictos/Guerras Globales", "Gráfico de Influencias"]: # Si no es la página de inicio, no hay datos de mapa y no es un tipo con visualización especial.
+    if entity_type != "Inicio" and not map_data and entity_type not in ["Conflictos/Guerras Globales", "Eventos Históricos", "Gráfico de Influencias"]: # Si no es la página de inicio, no hay datos de mapa y no es un tipo con visualización especial.
         st.info("Utiliza los filtros en la barra lateral para explorar el patrimonio cultural.") # Muestra un mensaje para usar los filtros.
 
+# --- Exportación de los Resultados Completos ---
+# Permite descargar el resultado SPARQL completo de la sección actual (sin columnas recortadas).
+if results_table is not None and results_table.num_rows: # Si la sección actual obtuvo resultados.
+    with st.expander("⬇️ Exportar datos"): # Sección colapsable con las opciones de exportación.
+        export_format = st.selectbox("Formato", ("csv", "parquet", "jsonld"), key="export_format") # Formato de salida.
+
+        def build_export_file(export_table=results_table, export_format=export_format): # Genera el archivo solo al pulsar "Descargar".
+            if export_format == "parquet": # Parquet es un formato binario.
+                export_buffer = io.BytesIO()
+                export_results(export_table, export_buffer, export_format)
+                return export_buffer.getvalue()
+            export_buffer = io.StringIO() # CSV y JSON-LD son formatos de texto.
+            export_results(export_table, export_buffer, export_format)
+            return export_buffer.getvalue().encode("utf-8")
+
+        st.download_button( # Botón de descarga del archivo generado.
+            "Descargar", # Texto del botón.
+            data=build_export_file, # Función que genera el contenido del archivo cuando el usuario lo descarga.
+            file_name=f"culturaviva.{export_format}", # Nombre sugerido del archivo.
+            mime={"csv": "text/csv", "parquet": "application/vnd.apache.parquet", "jsonld": "application/ld+json"}[export_format] # Tipo MIME.
+        )
+        # st.download_button necesita el contenido completo, así que el archivo se genera entero en memoria al descargarlo.
+        st.caption("El archivo se genera completo en memoria al pulsar \"Descargar\". Para exportaciones grandes usa la línea de comandos, que escribe el archivo por bloques: `python export_data.py --help`") # Indica el modo por lotes.
+
 # --- Mapa Interactivo para Lugares y Patrimonio UNESCO ---
 # Muestra un mapa de Folium si hay datos geográficos disponibles para los tipos de entidad relevantes.
 if (entity_type == "Lugares") and map_data: # Si el tipo de entidad es "Lugares" o "Patrimonio UNESCO" (aunque en el código actual solo se usa "Lugares") y hay datos de mapa.
@@ -520,6 +696,8 @@ if data_to_display: # Si hay datos cargados en la aplicación.
         fact = f"¿Sabías que **{random_item['Nombre']}**, nacido el {random_item['Fecha de Nacimiento']} en {random_item['Lugar de Nacimiento']}, es una personalidad ecuatoriana destacada? [Más info]({random_item['URL']})" # Formato del dato curioso para personalidades.
     elif random_item['Tipo'] == "Músico": # Si el elemento es un "Músico".
         fact = f"¿Sabías que **{random_item['Nombre']}**, un músico ecuatoriano, nació el {random_item['Fecha de Nacimiento']} en {random_item['Lugar de Nacimiento']}? [Más info]({random_item['URL']})" # Formato del dato curioso para músicos.
+    elif random_item['Tipo'] == "Evento Histórico": # Si el elemento es un "Evento Histórico".
+        fact = f"¿Sabías que **{random_item['Nombre']}** ocurrió el {random_item['Fecha']} en {random_item['Lugar']}? \"{random_item['Descripción'][:100]}...\" [Más info]({random_item['URL']})" # Formato del dato curioso para eventos históricos.
     elif random_item['Tipo'] == "Conflicto/Guerra": # Si el elemento es un "Conflicto/Guerra".
         # Check if 'Fecha de Inicio' and 'Fecha de Fin' keys exist for random_item
         inicio_val = random_item.get('Fecha de Inicio', 'Desconocido') # Obtiene la fecha de inicio, o 'Desconocido'.
@@ -0,0 +1,139 @@
+import json # Módulo para guardar la lista de variables en los metadatos del esquema Arrow.
+import os # Módulo para leer la configuración de compresión desde variables de entorno.
+
+import pyarrow as pa # Librería Arrow, usada para almacenar los resultados en columnas codificadas por diccionario.
+import pyarrow.compute as pc # Funciones de Arrow para convertir columnas codificadas por diccionario a texto.
+
+# --- Configuración de la Caché en Columnas ---
+SUPPORTED_COMPRESSIONS = ("zstd", "lz4") # Códecs que admite el formato IPC de Arrow.
+TERM_FIELDS = ("type", "xml:lang", "datatype") # Atributos de cada término SPARQL JSON, además de 'value'.
+VARS_METADATA_KEY = b"sparql_vars" # Clave de los metadatos del esquema con el orden de las variables.
+
+# --- Funciones Auxiliares ---
+
+def column_name(var, field):
+    """Nombre de la columna Arrow que guarda el atributo `field` de la variable `var`."""
+    return var if field == "value" else f"{var}@{field}"
+
+def get_compression(compression):
+    """
+    Devuelve `compression` si es un códec IPC admitido y disponible en esta instalación.
+    Cualquier otro valor (ej. "none", "gzip" o un nombre desconocido) desactiva la compresión.
+    """
+    if compression not in SUPPORTED_COMPRESSIONS or not pa.Codec.is_available(compression):
+        return None
+    return compression
+
+# Códec de compresión del buffer IPC de Arrow ("zstd", "lz4" o "none"), validado una sola vez al importar.
+# Con compresión la caché ocupa mucho menos, pero cada lectura descomprime el buffer; con "none" la tabla
+# se lee sin copiar los datos, a cambio de guardar el buffer completo.
+CACHE_COMPRESSION = get_compression(os.environ.get("CULTURAVIVA_CACHE_COMPRESSION", "zstd"))
+
+# --- Codificación y Decodificación ---
+
+def encode_results(results, compression=None):
+    """
+    Convierte un resultado SPARQL JSON en un buffer IPC de Arrow compacto.
+    Cada variable se guarda como columnas codificadas por diccionario ('value' y los atributos de TERM_FIELDS
+    presentes), así los IRIs, descripciones y envoltorios repetidos se almacenan una sola vez.
+    """
+    bindings = results.get('results', {}).get('bindings', [])
+    variables = list(results.get('head', {}).get('vars', []))
+    for item in bindings: # Agrega variables presentes solo en las filas.
+        for var in item:
+            if var not in variables:
+                variables.append(var)
+
+    arrays, names = [], []
+    for var in variables:
+        terms = [item.get(var) for item in bindings]
+        for field in ("value",) + TERM_FIELDS:
+            column = [term.get(field) if term else None for term in terms]
+            if field != "value" and all(value is None for value in column): # Omite atributos que nunca aparecen.
+                continue
+            arrays.append(pa.array(column, type=pa.string()).dictionary_encode())
+            names.append(column_name(var, field))
+
+    table = pa.Table.from_arrays(arrays, names=names, metadata={VARS_METADATA_KEY: json.dumps(variables).encode("utf-8")})
+    sink = pa.BufferOutputStream()
+    options = pa.ipc.IpcWriteOptions(compression=CACHE_COMPRESSION if compression is None else get_compression(compression))
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def decode_table(encoded):
+    """
+    Lee el buffer IPC de Arrow como una tabla. Sin compresión la lectura no copia los datos;
+    con compresión solo se descomprime el buffer, sin reconstruir los diccionarios.
+    """
+    return pa.ipc.open_stream(pa.py_buffer(encoded)).read_all()
+
+def result_variables(table):
+    """Devuelve las variables SPARQL de una tabla generada por encode_results, en el orden del SELECT."""
+    return json.loads(table.schema.metadata[VARS_METADATA_KEY])
+
+def decode_column(column):
+    """
+    Convierte una columna codificada por diccionario en una lista de Python (None para los valores ausentes).
+    Solo se convierte a Python el diccionario (un valor por cadena distinta); las filas se resuelven con los índices.
+    """
+    column = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    if len(column) == 0:
+        return []
+    dictionary = column.dictionary.to_pylist()
+    indices = column.indices
+    missing = indices.is_null().to_numpy(zero_copy_only=False).tolist()
+    positions = indices.fill_null(0).to_numpy().tolist()
+    return [None if is_missing else dictionary[position] for position, is_missing in zip(positions, missing)]
+
+def table_to_results(table, variables=None):
+    """
+    Reconstruye el resultado SPARQL JSON a partir de una tabla generada por encode_results.
+    Si se indica `variables`, solo se decodifican esas variables. Devuelve None si `table` es None.
+    """
+    if table is None:
+        return None
+    variables = [var for var in result_variables(table) if variables is None or var in variables]
+    names = set(table.column_names)
+    bindings = [{} for _ in range(table.num_rows)]
+    for var in variables: # encode_results siempre guarda la columna 'value' de cada variable, aunque esté vacía.
+        fields = [(field, decode_column(table.column(column_name(var, field))))
+                  for field in TERM_FIELDS if column_name(var, field) in names]
+        for row, value in enumerate(decode_column(table.column(var))):
+            if value is None: # Variable sin valor en esta fila (ej. un OPTIONAL no satisfecho).
+                continue
+            term = {"value": value}
+            for field, field_values in fields:
+                if field_values[row] is not None:
+                    term[field] = field_values[row]
+            bindings[row][var] = term
+    return {"head": {"vars": variables}, "results": {"bindings": bindings}}
+
+def decode_results(encoded, variables=None):
+    """Reconstruye el resultado SPARQL JSON original a partir del buffer generado por encode_results."""
+    return table_to_results(decode_table(encoded), variables)
+
+def values_dataframe(table, variables=None):
+    """
+    Devuelve un DataFrame de Pandas con el valor (como texto) de cada variable, sin pasar por el formato JSON.
+    Si se indica `variables`, solo se incluyen esas variables.
+    """
+    variables = [var for var in result_variables(table) if variables is None or var in variables]
+    columns = [pc.cast(table.column(var), pa.string()) for var in variables]
+    return pa.table(columns, names=variables).to_pandas()
+
+def value_rows(table, variables=None):
+    """
+    Devuelve las filas de la tabla como diccionarios variable -> valor (texto), sin pasar por el formato JSON.
+    Las variables sin valor en una fila se omiten, como en SPARQL JSON. Devuelve [] si `table` es None.
+    """
+    if table is None:
+        return []
+    variables = [var for var in result_variables(table) if variables is None or var in variables]
+    columns = [(var, decode_column(table.column(var))) for var in variables]
+    return [{var: values[row] for var, values in columns if values[row] is not None} for row in range(table.num_rows)]
+
+def iter_table_chunks(table, chunk_size):
+    """Recorre la tabla en bloques de chunk_size filas; cada bloque es una vista de la tabla, sin copiar los datos."""
+    for start in range(0, table.num_rows, chunk_size):
+        yield table.slice(start, chunk_size)
@@ -0,0 +1,178 @@
+import argparse # Módulo para leer los argumentos de la línea de comandos (modo CLI sin interfaz).
+import csv # Módulo para escribir archivos CSV fila por fila.
+import json # Módulo para serializar los nodos JSON-LD.
+import sys # Necesario para escribir a la salida estándar y devolver códigos de salida.
+
+import pyarrow as pa # Librería Arrow, usada para leer los bloques (chunks) de columnas.
+import pyarrow.compute as pc # Funciones de Arrow para convertir las columnas codificadas por diccionario a texto.
+import pyarrow.parquet as pq # Escritor de Parquet que permite añadir bloques de filas de forma incremental.
+import requests # Necesario para capturar los errores de red en el modo CLI.
+
+from columnar_cache import ( # Lectura de los resultados en columnas, el mismo formato que guarda la caché.
+    encode_results,
+    decode_table,
+    decode_column,
+    iter_table_chunks,
+    result_variables,
+    table_to_results
+)
+
+if __name__ == "__main__": # En modo CLI no hay runtime de Streamlit: se silencian sus avisos de "modo bare".
+    from streamlit import logger as streamlit_logger
+    streamlit_logger.set_log_level("ERROR")
+
+from sparql_queries import ( # Funciones de consulta que alimentan cada conjunto de datos exportable.
+    execute_sparql_query,
+    get_monuments_or_places_in_ecuador,
+    get_ecuadorian_personalities,
+    get_ecuadorian_musicians,
+    get_historical_events_in_ecuador,
+    get_global_wars_and_conflicts,
+    get_unesco_world_heritage_sites,
+    get_influencer_relationships
+)
+
+# --- Configuración de la Exportación ---
+EXPORT_FORMATS = ("csv", "parquet", "jsonld") # Formatos de salida soportados.
+DEFAULT_CHUNK_SIZE = 1000 # Número de filas que se escriben en cada bloque.
+JSONLD_VOCAB = "urn:culturaviva:vocab:" # Vocabulario base (URN propio, sin depender de un dominio) para las propiedades JSON-LD.
+
+# Conjuntos de datos exportables: nombre -> (función de consulta, nombre del parámetro de búsqueda, admite ventana de años).
+# El parámetro de búsqueda es None cuando la consulta no admite filtros de texto; la ventana de años
+# (start_year/end_year) solo existe en las consultas con línea de tiempo.
+EXPORT_DATASETS = {
+    "lugares": (get_monuments_or_places_in_ecuador, "city", False),
+    "personalidades": (get_ecuadorian_personalities, "search_term", False),
+    "musicos": (get_ecuadorian_musicians, "search_term", False),
+    "eventos": (get_historical_events_in_ecuador, "search_term", True),
+    "conflictos": (get_global_wars_and_conflicts, "search_term", True),
+    "unesco": (get_unesco_world_heritage_sites, "search_term", False),
+    "influencias": (get_influencer_relationships, None, False)
+}
+
+# --- Funciones Auxiliares ---
+
+def fetch_dataset(dataset, search_term=None, limit=None, start_year=None, end_year=None):
+    """
+    Ejecuta la consulta asociada a un conjunto de datos sin caché ni Streamlit y devuelve el resultado
+    como tabla Arrow (el mismo formato que run_sparql_table). `start_year` y `end_year` limitan los
+    conjuntos con línea de tiempo a la misma ventana de años que usa la interfaz. Lanza
+    requests.exceptions.RequestException si la consulta falla.
+    """
+    if dataset not in EXPORT_DATASETS: # Verifica que el conjunto de datos exista.
+        raise ValueError(f"Conjunto de datos desconocido: {dataset}. Opciones: {', '.join(EXPORT_DATASETS)}")
+    query_function, search_param, supports_window = EXPORT_DATASETS[dataset]
+    kwargs = {}
+    if search_param and search_term: # Solo se pasa el filtro si la consulta lo admite.
+        kwargs[search_param] = search_term
+    if limit: # Permite pedir más filas que las que muestra la interfaz.
+        kwargs["limit"] = limit
+    if start_year is not None or end_year is not None: # Ventana de años, solo para eventos y conflictos.
+        if not supports_window:
+            raise ValueError(f"El conjunto de datos '{dataset}' no admite una ventana de años.")
+        kwargs.update(start_year=start_year, end_year=end_year)
+    results = execute_sparql_query(*query_function.build(**kwargs))
+    return decode_table(encode_results(results, compression="none")) # Sin compresión: no se guarda, solo se exporta.
+
+# --- Escritores por Formato ---
+
+def write_csv(table, output, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Escribe los valores de la tabla como CSV en un archivo de texto abierto, un bloque a la vez."""
+    variables = result_variables(table)
+    writer = csv.writer(output)
+    writer.writerow(variables) # Cabecera con los nombres de las variables.
+    for chunk in iter_table_chunks(table, chunk_size):
+        columns = [decode_column(chunk.column(var)) for var in variables]
+        writer.writerows([['' if value is None else value for value in row] for row in zip(*columns)])
+
+def write_parquet(table, output, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Escribe los valores de la tabla como Parquet en un archivo binario abierto, un grupo de filas por bloque."""
+    variables = result_variables(table)
+    schema = pa.schema([(var, pa.string()) for var in variables]) # Todas las columnas se exportan como texto.
+    with pq.ParquetWriter(output, schema) as writer:
+        for chunk in iter_table_chunks(table, chunk_size):
+            writer.write_table(pa.table([pc.cast(chunk.column(var), pa.string()) for var in variables], schema=schema))
+
+def binding_to_jsonld(item):
+    """
+    Convierte una fila SPARQL JSON en un nodo JSON-LD.
+    El primer IRI de la fila se usa como @id (las consultas siempre seleccionan el recurso primero).
+    """
+    node = {}
+    for var, term in item.items():
+        if term.get('type') == 'uri':
+            if '@id' not in node: # El recurso principal de la fila.
+                node['@id'] = term['value']
+            node[var] = {'@id': term['value']}
+        elif term.get('type') == 'bnode': # Nodo en blanco: se enlaza con un identificador "_:" y no como texto.
+            node[var] = {'@id': '_:' + term['value']}
+        elif 'xml:lang' in term: # Literal con idioma (ej. descripciones en español).
+            node[var] = {'@value': term['value'], '@language': term['xml:lang']}
+        elif 'datatype' in term: # Literal tipado (ej. fechas y coordenadas).
+            node[var] = {'@value': term['value'], '@type': term['datatype']}
+        else:
+            node[var] = term['value']
+    return node
+
+def write_jsonld(table, output, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Escribe la tabla como un documento JSON-LD con un @graph; solo se reconstruyen las filas de un bloque a la vez."""
+    output.write('{"@context": ' + json.dumps({"@vocab": JSONLD_VOCAB}) + ', "@graph": [')
+    first = True
+    for chunk in iter_table_chunks(table, chunk_size):
+        for item in table_to_results(chunk)['results']['bindings']:
+            output.write(('' if first else ',') + '\n' + json.dumps(binding_to_jsonld(item), ensure_ascii=False))
+            first = False
+    output.write('\n]}\n')
+
+def export_results(table, output, export_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Exporta una tabla de resultados (ver run_sparql_table) al archivo abierto `output` en el formato indicado.
+    CSV y JSON-LD esperan un archivo de texto; Parquet espera un archivo binario.
+    """
+    if export_format == "csv":
+        write_csv(table, output, chunk_size)
+    elif export_format == "parquet":
+        write_parquet(table, output, chunk_size)
+    elif export_format == "jsonld":
+        write_jsonld(table, output, chunk_size)
+    else:
+        raise ValueError(f"Formato de exportación desconocido: {export_format}. Opciones: {', '.join(EXPORT_FORMATS)}")
+
+# --- Modo CLI (sin interfaz de Streamlit) ---
+
+def main(argv=None):
+    """Punto de entrada para exportaciones por lotes: python export_data.py personalidades -f csv -o personas.csv"""
+    parser = argparse.ArgumentParser(description="Exporta los resultados de CulturaViva a CSV, Parquet o JSON-LD.")
+    parser.add_argument("dataset", choices=sorted(EXPORT_DATASETS), help="Conjunto de datos a exportar.")
+    parser.add_argument("-f", "--format", choices=EXPORT_FORMATS, default="csv", help="Formato de salida.")
+    parser.add_argument("-o", "--output", default="-", help="Archivo de salida ('-' para la salida estándar, no válido para Parquet).")
+    parser.add_argument("-s", "--search", default=None, help="Término de búsqueda (o ciudad, para 'lugares').")
+    parser.add_argument("-l", "--limit", type=int, default=None, help="Número máximo de filas a pedir al endpoint.")
+    parser.add_argument("--start-year", type=int, default=None, help="Primer año de la ventana de tiempo (solo 'eventos' y 'conflictos').")
+    parser.add_argument("--end-year", type=int, default=None, help="Último año de la ventana de tiempo (solo 'eventos' y 'conflictos').")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Filas por bloque de escritura.")
+    args = parser.parse_args(argv)
+
+    if args.format == "parquet" and args.output == "-":
+        parser.error("El formato Parquet requiere un archivo de salida (-o).")
+    if (args.start_year is not None or args.end_year is not None) and not EXPORT_DATASETS[args.dataset][2]:
+        parser.error(f"--start-year y --end-year solo se admiten para: {', '.join(name for name, spec in EXPORT_DATASETS.items() if spec[2])}.")
+
+    try:
+        table = fetch_dataset(args.dataset, search_term=args.search, limit=args.limit, start_year=args.start_year, end_year=args.end_year)
+    except requests.exceptions.RequestException as e: # Errores de red, timeouts o errores HTTP del endpoint.
+        print(f"No se pudo obtener el conjunto de datos '{args.dataset}': {e}", file=sys.stderr)
+        return 1
+
+    if args.output == "-":
+        export_results(table, sys.stdout, args.format, args.chunk_size)
+    elif args.format == "parquet":
+        with open(args.output, "wb") as output:
+            export_results(table, output, args.format, args.chunk_size)
+    else:
+        with open(args.output, "w", encoding="utf-8", newline="") as output:
+            export_results(table, output, args.format, args.chunk_size)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""
+Servidor SPARQL local que sustituye a DBpedia y Wikidata durante el desarrollo sin conexión
+y las pruebas de carga.
+
+Responde cada consulta, en este orden, con:
+  1. Una respuesta grabada en el directorio --recordings (un archivo JSON por consulta).
+  2. El resultado de ejecutar la consulta sobre una instantánea RDF local (--data, requiere rdflib).
+     rdflib no puede ejecutar el servicio SERVICE wikibase:label de Wikidata, así que se emula:
+     cada ?xLabel se reemplaza por el rdfs:label de ?x en los idiomas pedidos ([AUTO_LANGUAGE] = "en"),
+     o por el identificador de la entidad si no tiene etiqueta. ?xDescription y ?xAltLabel no se emulan.
+  3. La respuesta del endpoint real asignado a la ruta de la solicitud, que además se graba para las
+     siguientes ejecuciones. Cada --upstream RUTA=URL asigna un endpoint a una ruta (ej. /wikidata/sparql);
+     --upstream URL, sin ruta, atiende las rutas que no tienen uno propio.
+  4. Un resultado vacío, si ninguna de las fuentes anteriores está disponible.
+Las grabaciones se identifican por la ruta y la consulta, así la misma consulta enviada a dos endpoints
+no comparte respuesta.
+
+Ejemplo (grabar una vez contra DBpedia y Wikidata con un único servidor y luego trabajar sin conexión):
+  python local_sparql_server.py --port 8890 --upstream /dbpedia/sparql=http://dbpedia.org/sparql --upstream /wikidata/sparql=https://query.wikidata.org/sparql
+  CULTURAVIVA_SPARQL_ENDPOINT="http://localhost:8890/{name}/sparql" streamlit run app.py
+  python local_sparql_server.py --port 8890 --latency-ms 300 --jitter-ms 200 --error-rate 0.1
+"""
+import argparse # Módulo para leer los argumentos de la línea de comandos.
+import hashlib # Módulo para calcular la clave (hash) de cada consulta grabada.
+import json # Módulo para leer y escribir las respuestas SPARQL JSON.
+import os # Módulo para manejar el directorio de grabaciones.
+import random # Módulo para simular latencia variable y errores aleatorios.
+import tempfile # Módulo para escribir las grabaciones en un archivo temporal antes de publicarlas.
+import re # Módulo para normalizar los espacios de las consultas.
+import threading # Módulo para proteger la instantánea RDF de accesos concurrentes.
+import time # Módulo para aplicar la latencia simulada.
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # Servidor HTTP concurrente de la librería estándar.
+from urllib.parse import parse_qs, urlparse # Funciones para leer el parámetro 'query'.
+
+import requests # Módulo para reenviar las consultas al endpoint real en modo grabación.
+
+# --- Configuración por Defecto ---
+DEFAULT_RECORDINGS_DIR = "sparql_recordings" # Directorio donde se guardan las respuestas grabadas.
+EMPTY_RESULT = {"head": {"vars": []}, "results": {"bindings": []}} # Respuesta cuando no hay ninguna fuente.
+
+# Prefijos que DBpedia y Wikidata declaran implícitamente y que las consultas de sparql_queries.py usan sin PREFIX.
+DEFAULT_PREFIXES = {
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "geo": "http://www.w3.org/2003/01/geo/wgs84_pos#",
+    "dbo": "http://dbpedia.org/ontology/",
+    "dbr": "http://dbpedia.org/resource/",
+    "wd": "http://www.wikidata.org/entity/",
+    "wdt": "http://www.wikidata.org/prop/direct/",
+    "schema": "http://schema.org/",
+    "wikibase": "http://wikiba.se/ontology#",
+    "bd": "http://www.bigdata.com/rdf#"
+}
+
+# Idioma que Wikidata usa para [AUTO_LANGUAGE] cuando la solicitud no indica otro.
+AUTO_LANGUAGE = "en"
+LABEL_SERVICE_PATTERN = re.compile(r"SERVICE\s+wikibase:label\s*\{[^{}]*\}") # Bloque del servicio de etiquetas.
+LANGUAGE_PARAM_PATTERN = re.compile(r'wikibase:language\s+"([^"]*)"') # Idiomas pedidos al servicio de etiquetas.
+UNBOUND_ENTITY = "<urn:culturaviva:unbound>" # IRI sin etiquetas que sustituye a las entidades sin valor (ej. OPTIONAL no satisfecho).
+
+# --- Funciones Auxiliares ---
+
+def query_key(query, path="/sparql"):
+    """Devuelve la clave de grabación de una consulta: el SHA-1 de la ruta y la consulta con los espacios normalizados."""
+    normalized = re.sub(r"\s+", " ", query).strip()
+    return hashlib.sha1(f"{path}\n{normalized}".encode("utf-8")).hexdigest()
+
+def parse_upstreams(values):
+    """
+    Convierte los valores de --upstream ("URL" o "RUTA=URL") en un diccionario ruta -> URL.
+    La clave None guarda el endpoint por defecto, usado en las rutas sin endpoint propio.
+    """
+    upstreams = {}
+    for value in values:
+        if value.startswith("/") and "=" in value: # Endpoint asignado a una ruta (ej. /wikidata/sparql=https://...).
+            path, url = value.split("=", 1)
+            upstreams[path] = url
+        else: # Endpoint por defecto.
+            upstreams[None] = value
+    return upstreams
+
+def emulate_label_service(query):
+    """
+    Reescribe el bloque SERVICE wikibase:label de una consulta de Wikidata como patrones rdfs:label,
+    para poder ejecutarla con rdflib. Devuelve la consulta sin cambios si no usa el servicio.
+    """
+    service = LABEL_SERVICE_PATTERN.search(query)
+    if not service:
+        return query
+    language_param = LANGUAGE_PARAM_PATTERN.search(service.group(0))
+    languages = [language.strip().replace("[AUTO_LANGUAGE]", AUTO_LANGUAGE)
+                 for language in (language_param.group(1) if language_param else AUTO_LANGUAGE).split(",")]
+
+    rest = query[:service.start()] + query[service.end():]
+    patterns = []
+    for label_var in dict.fromkeys(re.findall(r"\?(\w+)Label\b", rest)): # Variables ?xLabel, sin repetir.
+        if not re.search(rf"\?{label_var}\b", rest): # ?x debe existir en la consulta para tener etiqueta.
+            continue
+        # Si ?x no tiene valor, un patrón "?x rdfs:label ?l" le asignaría cualquier entidad con etiqueta;
+        # por eso la búsqueda se hace sobre una copia que vale UNBOUND_ENTITY en ese caso.
+        entity = f"?{label_var}_labelEntity"
+        patterns.append(f"BIND (COALESCE(?{label_var}, {UNBOUND_ENTITY}) AS {entity})")
+        candidates = []
+        for index, language in enumerate(languages): # Una etiqueta opcional por idioma, en orden de preferencia.
+            candidate = f"?{label_var}Label_{index}"
+            patterns.append(f'OPTIONAL {{ {entity} rdfs:label {candidate} . FILTER (lang({candidate}) = "{language}") }}')
+            candidates.append(candidate)
+        fallback = f'REPLACE(STR(?{label_var}), "^.*[/#]", "")' # Como Wikidata: el identificador si no hay etiqueta.
+        patterns.append(f"BIND (COALESCE({', '.join(candidates)}, {fallback}) AS ?{label_var}Label)")
+    return query[:service.start()] + "\n".join(patterns) + query[service.end():]
+
+class SparqlBackend:
+    """Reúne las fuentes de respuesta del servidor: grabaciones, instantánea RDF y endpoint real."""
+
+    def __init__(self, recordings_dir=DEFAULT_RECORDINGS_DIR, data_files=(), upstreams=None):
+        self.recordings_dir = recordings_dir
+        self.upstreams = upstreams or {} # Ruta -> endpoint real (ver parse_upstreams).
+        self.graph = None
+        self.graph_lock = threading.Lock() # rdflib no garantiza consultas concurrentes seguras sobre el mismo grafo.
+        if data_files: # Solo se importa rdflib si se pidió una instantánea local.
+            import rdflib
+            self.graph = rdflib.Graph()
+            for path in data_files:
+                self.graph.parse(path)
+
+    def recording_path(self, query, path):
+        """Ruta del archivo con la respuesta grabada de una consulta enviada a la ruta `path`."""
+        return os.path.join(self.recordings_dir, f"{query_key(query, path)}.json")
+
+    def load_recording(self, query, path):
+        """Devuelve la respuesta grabada de la consulta, o None si no existe."""
+        recording_path = self.recording_path(query, path)
+        if not os.path.exists(recording_path):
+            return None
+        with open(recording_path, encoding="utf-8") as recording:
+            return json.load(recording)
+
+    def save_recording(self, query, path, result):
+        """Guarda la respuesta de una consulta junto con la ruta y el texto de la consulta (para poder revisarla)."""
+        os.makedirs(self.recordings_dir, exist_ok=True)
+        # Se escribe en un archivo temporal y se publica con os.replace (atómico), para que otro hilo
+        # que atiende la misma consulta nunca lea una grabación a medio escribir.
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.recordings_dir, suffix=".tmp", delete=False) as recording:
+            json.dump(dict(result, query=query, path=path), recording, ensure_ascii=False)
+        os.replace(recording.name, self.recording_path(query, path))
+
+    def run_local(self, query):
+        """Ejecuta la consulta sobre la instantánea RDF local y devuelve el resultado SPARQL JSON."""
+        with self.graph_lock:
+            result = self.graph.query(emulate_label_service(query), initNs=DEFAULT_PREFIXES)
+            return json.loads(result.serialize(format="json"))
+
+    def upstream_for(self, path):
+        """Devuelve el endpoint real asignado a la ruta `path`, el endpoint por defecto o None."""
+        return self.upstreams.get(path, self.upstreams.get(None))
+
+    def run_upstream(self, query, path, upstream):
+        """Reenvía la consulta al endpoint real `upstream` y graba la respuesta."""
+        headers = {'Accept': 'application/sparql-results+json'}
+        response = requests.get(upstream, params={'query': query}, headers=headers, timeout=60)
+        response.raise_for_status()
+        result = response.json()
+        self.save_recording(query, path, result)
+        return result
+
+    def answer(self, query, path="/sparql"):
+        """Devuelve la respuesta SPARQL JSON de una consulta enviada a la ruta `path` usando la primera fuente disponible."""
+        result = self.load_recording(query, path)
+        if result is not None:
+            result.pop("query", None) # El texto de la consulta y la ruta solo se guardan como referencia.
+            result.pop("path", None)
+            return result
+        if self.graph is not None:
+            return self.run_local(query)
+        upstream = self.upstream_for(path)
+        if upstream:
+            return self.run_upstream(query, path, upstream)
+        return EMPTY_RESULT
+
+class FaultProfile:
+    """Perfil de latencia y errores simulados que se aplica a cada solicitud."""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, error_status=503):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def delay(self):
+        """Espera la latencia base más una variación aleatoria uniforme."""
+        seconds = (self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def should_fail(self):
+        """Decide aleatoriamente si la solicitud actual debe responder con error."""
+        return random.random() < self.error_rate
+
+# --- Servidor HTTP ---
+
+def make_handler(backend, faults):
+    """Crea la clase de manejador HTTP que usa el backend y el perfil de fallos indicados."""
+
+    class SparqlRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # Permite conexiones persistentes, como los endpoints reales.
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            self.handle_query(parse_qs(url.query).get("query", [None])[0], url.path)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length).decode("utf-8")
+            path = urlparse(self.path).path
+            if self.headers.get("Content-Type", "").startswith("application/sparql-query"): # Consulta en el cuerpo.
+                self.handle_query(body, path)
+            else: # Formulario application/x-www-form-urlencoded.
+                self.handle_query(parse_qs(body).get("query", [None])[0], path)
+
+        def handle_query(self, query, path):
+            faults.delay()
+            if not query:
+                self.send_json(400, {"error": "Falta el parámetro 'query'."})
+                return
+            if faults.should_fail():
+                self.send_json(faults.error_status, {"error": "Error simulado por el servidor SPARQL local."})
+                return
+            try:
+                self.send_json(200, backend.answer(query, path), content_type="application/sparql-results+json")
+            except Exception as e: # Errores de sintaxis en la consulta o fallos del endpoint real.
+                self.send_json(500, {"error": str(e)})
+
+        def send_json(self, status, payload, content_type="application/json"):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            if status == 429: # Indica al cliente cuándo reintentar, como hace Wikidata.
+                self.send_header("Retry-After", "1")
+            self.end_headers()
+            self.wfile.write(body)
+
+    return SparqlRequestHandler
+
+def main(argv=None):
+    """Punto de entrada del servidor: python local_sparql_server.py --help"""
+    parser = argparse.ArgumentParser(description="Servidor SPARQL local para desarrollo sin conexión y pruebas de carga.")
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección en la que escucha el servidor.")
+    parser.add_argument("--port", type=int, default=8890, help="Puerto en el que escucha el servidor.")
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS_DIR, help="Directorio de respuestas grabadas.")
+    parser.add_argument("--data", action="append", default=[], help="Archivo RDF de la instantánea local (se puede repetir).")
+    parser.add_argument("--upstream", action="append", default=[],
+                        help="Endpoint real al que se reenvían y graban las consultas no grabadas: URL, o RUTA=URL para una sola ruta (se puede repetir).")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latencia base añadida a cada solicitud.")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Variación aleatoria máxima de la latencia.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de solicitudes que responden con error (0 a 1).")
+    parser.add_argument("--error-status", type=int, default=503, help="Código HTTP de los errores simulados (ej. 429, 500, 503).")
+    args = parser.parse_args(argv)
+
+    backend = SparqlBackend(args.recordings, args.data, parse_upstreams(args.upstream))
+    faults = FaultProfile(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(backend, faults))
+    print(f"Servidor SPARQL local en http://{args.host}:{args.port}/sparql")
+    for path, url in backend.upstreams.items(): # Muestra a dónde se reenvía cada ruta en modo grabación.
+        print(f"  {path or '(por defecto)'} -> {url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
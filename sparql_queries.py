@@ -1,28 +1,124 @@
+import functools # Necesario para conservar el nombre y la documentación de las funciones decoradas.
+import os # Necesario para leer la configuración de endpoints desde variables de entorno.
 import requests # Módulo para realizar solicitudes HTTP (para las APIs SPARQL).
 import streamlit as st # Necesario para usar st.cache_data y st.error.
 
+from columnar_cache import encode_results, decode_table, table_to_results # Codificación en columnas de los resultados guardados en caché.
+
 # --- Configuración de Endpoints SPARQL ---
 DBPEDIA_ENDPOINT = "http://dbpedia.org/sparql"
 WIKIDATA_ENDPOINT = "https://query.wikidata.org/sparql"
 
+# Registro de endpoints: nombre lógico -> URL pública por defecto.
+# Cada endpoint se puede redirigir con una variable de entorno, por ejemplo
+# CULTURAVIVA_WIKIDATA_ENDPOINT=http://localhost:8890/sparql para usar el servidor local
+# (local_sparql_server.py) durante el desarrollo sin conexión o las pruebas de carga.
+# CULTURAVIVA_SPARQL_ENDPOINT redirige todos a la vez; "{name}" se reemplaza por el nombre del endpoint
+# (ej. http://localhost:8890/{name}/sparql), así un único servidor local sabe a qué endpoint real corresponde cada consulta.
+SPARQL_ENDPOINTS = {
+    "dbpedia": DBPEDIA_ENDPOINT,
+    "wikidata": WIKIDATA_ENDPOINT
+}
+
+def get_endpoint(name):
+    """Devuelve la URL del endpoint registrado con `name`, aplicando la variable de entorno si existe."""
+    if name not in SPARQL_ENDPOINTS: # Verifica que el endpoint esté registrado.
+        raise ValueError(f"Endpoint SPARQL desconocido: {name}. Opciones: {', '.join(SPARQL_ENDPOINTS)}")
+    # CULTURAVIVA_SPARQL_ENDPOINT redirige todos los endpoints a la vez (ej. un único servidor local).
+    default = os.environ.get("CULTURAVIVA_SPARQL_ENDPOINT", SPARQL_ENDPOINTS[name]).replace("{name}", name)
+    return os.environ.get(f"CULTURAVIVA_{name.upper()}_ENDPOINT", default)
+
 # --- Función Auxiliar para Ejecutar Consultas ---
-@st.cache_data(ttl=3600) # Cachea los resultados por 1 hora
-def run_sparql_query(endpoint, query):
-    """Ejecuta una consulta SPARQL y devuelve los resultados en formato JSON."""
+def execute_sparql_query(endpoint, query):
+    """
+    Ejecuta una consulta SPARQL sin caché ni Streamlit y devuelve los resultados en formato JSON.
+    Lanza requests.exceptions.RequestException si la solicitud falla (ej. en el modo CLI de export_data.py).
+    """
     headers = {'Accept': 'application/sparql-results+json'} # Indica que se espera una respuesta JSON.
     params = {'query': query} # El diccionario de parámetros incluye la consulta SPARQL.
+    # Realiza una solicitud GET al endpoint con la consulta y las cabeceras.
+    response = requests.get(endpoint, params=params, headers=headers, timeout=30)
+    response.raise_for_status() # Verifica si la solicitud fue exitosa (código 200). Si no, lanza una excepción.
+    return response.json() # Retorna la respuesta en formato JSON.
+
+@st.cache_data(ttl=3600) # Cachea los resultados por 1 hora
+def fetch_sparql_columnar(endpoint, query):
+    """
+    Ejecuta una consulta SPARQL y devuelve los resultados codificados en columnas (ver columnar_cache.py).
+    La caché guarda este buffer comprimido en lugar del JSON, que repite los envoltorios de cada celda.
+    """
     try:
-        # Realiza una solicitud GET al endpoint con la consulta y las cabeceras.
-        response = requests.get(endpoint, params=params, headers=headers, timeout=30)
-        response.raise_for_status() # Verifica si la solicitud fue exitosa (código 200). Si no, lanza una excepción.
-        return response.json() # Retorna la respuesta en formato JSON.
+        return encode_results(execute_sparql_query(endpoint, query)) # Retorna la respuesta JSON codificada en columnas.
     except requests.exceptions.RequestException as e:
         # Captura cualquier error relacionado con la solicitud (ej. problemas de red, timeouts, errores HTTP).
         st.error(f"Error al conectar con el endpoint SPARQL {endpoint}: {e}") # Muestra un mensaje de error en la interfaz de Streamlit.
         return None # Retorna None para indicar que la consulta falló.
 
+def run_sparql_table(endpoint, query):
+    """
+    Ejecuta una consulta SPARQL (usando la caché) y devuelve los resultados como tabla Arrow,
+    sin reconstruir las filas JSON. Retorna None si la consulta falló.
+    """
+    encoded = fetch_sparql_columnar(endpoint, query)
+    return decode_table(encoded) if encoded is not None else None
+
+def run_sparql_query(endpoint, query):
+    """Ejecuta una consulta SPARQL (usando la caché) y devuelve los resultados en formato JSON."""
+    return table_to_results(run_sparql_table(endpoint, query))
+
+def sparql_query(build_query):
+    """
+    Decorador para las funciones de consulta: la función decorada construye la consulta y devuelve
+    (endpoint, consulta); al llamarla se ejecuta con run_sparql_query. `.table` ejecuta la misma consulta
+    con run_sparql_table (resultado en columnas Arrow) y `.build` expone la función original para
+    ejecutarla por otra vía (ej. sin Streamlit).
+    """
+    @functools.wraps(build_query)
+    def run_query(*args, **kwargs):
+        return run_sparql_query(*build_query(*args, **kwargs))
+    run_query.table = lambda *args, **kwargs: run_sparql_table(*build_query(*args, **kwargs))
+    run_query.build = build_query
+    return run_query
+
+# --- Agregación en el Servidor (GROUP BY) ---
+# Idioma que Wikidata usa para [AUTO_LANGUAGE] en las consultas sin idioma de interfaz: es el de las etiquetas ?xLabel
+# que muestra la página (el servicio de etiquetas prueba "[AUTO_LANGUAGE],es" en ese orden).
+AUTO_LANGUAGE = "en"
+
+# Expresiones SPARQL que agrupan una fecha en periodos; el periodo se identifica por su primer año.
+PERIOD_EXPRESSIONS = {
+    "year": "YEAR({var})",
+    "decade": "(FLOOR(YEAR({var}) / 10) * 10)",
+    "century": "(FLOOR(YEAR({var}) / 100) * 100)"
+}
+
+def year_window_filter(var, start_year=None, end_year=None):
+    """Devuelve un FILTER que limita la fecha `var` a la ventana [start_year, end_year] (ambos opcionales)."""
+    conditions = []
+    if start_year is not None:
+        conditions.append(f"YEAR({var}) >= {int(start_year)}")
+    if end_year is not None:
+        conditions.append(f"YEAR({var}) <= {int(end_year)}")
+    return f"FILTER ({' && '.join(conditions)})" if conditions else ""
+
+def label_search_filter(var, search_term=None):
+    """
+    Filtro de búsqueda sobre la etiqueta que muestra la página (idioma AUTO_LANGUAGE), la etiqueta en español
+    y la descripción en español de `var`. Usa rdfs:label porque el servicio wikibase:label no se puede combinar
+    con GROUP BY; las consultas de detalle usan el mismo filtro para que sus resultados coincidan con los conteos agregados.
+    """
+    if not search_term:
+        return ""
+    return f"""
+      OPTIONAL {{ {var} rdfs:label ?searchDisplayLabel . FILTER (lang(?searchDisplayLabel) = "{AUTO_LANGUAGE}") }}
+      OPTIONAL {{ {var} rdfs:label ?searchLabel . FILTER (lang(?searchLabel) = "es") }}
+      OPTIONAL {{ {var} schema:description ?searchDescription . FILTER (lang(?searchDescription) = "es") }}
+      FILTER (CONTAINS(LCASE(STR(?searchDisplayLabel)), LCASE("{search_term}")) || CONTAINS(LCASE(STR(?searchLabel)), LCASE("{search_term}")) || CONTAINS(LCASE(STR(?searchDescription)), LCASE("{search_term}")))
+    """
+
 # --- Funciones de Consulta Específicas ---
 
+@sparql_query
 def get_monuments_or_places_in_ecuador(city=None, limit=10):
     """
     Obtiene  lugares de interés en Ecuador, opcionalmente filtrando por ciudad, desde DBpedia.
@@ -43,8 +139,9 @@ def get_monuments_or_places_in_ecuador(city=None, limit=10):
       FILTER (lang(?abstract) = "es")
     }} LIMIT {limit}
     """
-    return run_sparql_query(DBPEDIA_ENDPOINT, query)
+    return get_endpoint("dbpedia"), query
 
+@sparql_query
 def get_ecuadorian_personalities(search_term=None, limit=10):
     """
     Obtiene personalidades ecuatorianas destacadas desde Wikidata.
@@ -64,15 +161,17 @@ def get_ecuadorian_personalities(search_term=None, limit=10):
     {search_filter}
     }} LIMIT {limit}
     """
-    return run_sparql_query(WIKIDATA_ENDPOINT, query)
+    return get_endpoint("wikidata"), query
 
 # FUNCIÓN MODIFICADA: Eventos Históricos en Ecuador con tipos ampliados
-def get_historical_events_in_ecuador(search_term=None, limit=100): # Límite cambiado a 100
+@sparql_query
+def get_historical_events_in_ecuador(search_term=None, limit=100, start_year=None, end_year=None): # Límite cambiado a 100
     """
     Obtiene eventos históricos en Ecuador desde Wikidata, incluyendo diversos tipos de eventos.
-    Incluye la URL de la imagen.
+    Incluye la URL de la imagen. Si se indica una ventana de años, solo devuelve eventos fechados dentro de ella.
     """
-    search_filter = f'FILTER (CONTAINS(LCASE(?eventLabel), LCASE("{search_term}")) || CONTAINS(LCASE(?description), LCASE("{search_term}")))' if search_term else ""
+    search_filter = label_search_filter("?event", search_term) # Mismo filtro que los conteos agregados.
+    window_filter = year_window_filter("?pointInTime", start_year, end_year)
 
     query = f"""
     SELECT DISTINCT ?event ?eventLabel ?description ?pointInTime ?locationLabel ?image WHERE {{
@@ -101,18 +200,22 @@ def get_historical_events_in_ecuador(search_term=None, limit=100): # Límite cam
         FILTER (lang(?description) = "es")
       }}
       {search_filter} # Aplicar el filtro de búsqueda
+      {window_filter} # Aplicar la ventana de tiempo
     }}
     ORDER BY DESC(?pointInTime)
     LIMIT {limit}
     """
-    return run_sparql_query(WIKIDATA_ENDPOINT, query)
+    return get_endpoint("wikidata"), query
 # Función para obtener guerras y conflictos globales
-def get_global_wars_and_conflicts(search_term=None, limit=50):
+@sparql_query
+def get_global_wars_and_conflicts(search_term=None, limit=50, start_year=None, end_year=None):
     """
     Obtiene conflictos y guerras globales desde Wikidata.
     Asegura que los eventos tengan una fecha de inicio para la línea de tiempo.
+    Si se indica una ventana de años, solo devuelve los conflictos que iniciaron dentro de ella.
     """
-    search_filter = f'FILTER (CONTAINS(LCASE(?eventLabel), LCASE("{search_term}")) || CONTAINS(LCASE(?description), LCASE("{search_term}")))' if search_term else ""
+    search_filter = label_search_filter("?event", search_term) # Mismo filtro que los conteos agregados.
+    window_filter = year_window_filter("?startTime", start_year, end_year)
 
     query = f"""
     SELECT DISTINCT ?event ?eventLabel ?description ?startTime ?endTime ?locationLabel ?image WHERE {{
@@ -124,11 +227,84 @@ def get_global_wars_and_conflicts(search_term=None, limit=50):
     SERVICE wikibase:label {{ bd:serviceParam wikibase:language "[AUTO_LANGUAGE],es". }}
     OPTIONAL {{ ?event schema:description ?description. FILTER (lang(?description) = "es"). }}
     {search_filter}
+    {window_filter}
     }} ORDER BY DESC(?startTime) LIMIT {limit}
     """
-    return run_sparql_query(WIKIDATA_ENDPOINT, query)
+    return get_endpoint("wikidata"), query
+
+@sparql_query
+def get_global_wars_aggregates(search_term=None, period="decade"):
+    """
+    Cuenta los conflictos y guerras globales por periodo (año, década o siglo) de inicio, desde Wikidata.
+    La agrupación se hace en el endpoint, así que solo se transfieren los conteos y no cada guerra.
+    """
+    period_expression = PERIOD_EXPRESSIONS[period].format(var="?startTime")
+    query = f"""
+    SELECT ?period (COUNT(?event) AS ?count) WHERE {{
+      {{
+        # Una sola fila por guerra, con su primera fecha de inicio, para no contarla en varios periodos.
+        SELECT ?event (MIN(?eventStart) AS ?startTime) WHERE {{
+          ?event wdt:P31 wd:Q198 ; # Instance of: war (Q198)
+                 wdt:P580 ?eventStart . # Start time
+          {label_search_filter("?event", search_term)}
+        }}
+        GROUP BY ?event
+      }}
+      BIND ({period_expression} AS ?period)
+    }}
+    GROUP BY ?period
+    ORDER BY ?period
+    """
+    return get_endpoint("wikidata"), query
+
+@sparql_query
+def get_historical_events_aggregates(search_term=None, period="decade", group_by="type"):
+    """
+    Cuenta los eventos históricos en Ecuador por periodo y por tipo (?instanceOf) o lugar (?location), desde Wikidata.
+    Solo se cuentan los eventos con fecha (P585), porque son los únicos que se pueden ubicar en el tiempo.
+    Cada evento se cuenta una sola vez por tipo: si tiene varios tipos de la lista, se usa el primero (MIN).
+    """
+    period_expression = PERIOD_EXPRESSIONS[period].format(var="?pointInTime")
+    if group_by == "type": # Agrupa por el tipo de evento y usa su etiqueta en español.
+        group_var, group_pattern = "?instanceOf", 'OPTIONAL { ?instanceOf rdfs:label ?groupName . FILTER (lang(?groupName) = "es") }'
+    elif group_by == "location": # Agrupa por el lugar del evento (P276).
+        group_var, group_pattern = "?location", '?event wdt:P276 ?location . OPTIONAL { ?location rdfs:label ?groupName . FILTER (lang(?groupName) = "es") }'
+    else:
+        raise ValueError(f"Agrupación desconocida: {group_by}. Opciones: type, location")
+
+    query = f"""
+    SELECT ?period ?group (SAMPLE(?groupName) AS ?groupLabel) (COUNT(DISTINCT ?event) AS ?count) WHERE {{
+      {{
+        # Una sola fila por evento, con un único tipo y su primera fecha.
+        SELECT ?event (MIN(?eventType) AS ?instanceOf) (MIN(?eventDate) AS ?pointInTime) WHERE {{
+          ?event wdt:P31 ?eventType ;
+                 wdt:P17 wd:Q736 ; # Q736 = Ecuador
+                 wdt:P585 ?eventDate . # Fecha
+
+          FILTER(?eventType IN (
+            wd:Q1190554,  # evento histórico
+            wd:Q1656682,  # evento
+            wd:Q180684,    # conflicto
+            wd:Q186362,    # protesta
+            wd:Q40231,     # elección
+            wd:Q132241     # desastre natural
+          ))
+          {label_search_filter("?event", search_term)}
+        }}
+        GROUP BY ?event
+      }}
+
+      {group_pattern}
+      BIND ({group_var} AS ?group)
+      BIND ({period_expression} AS ?period)
+    }}
+    GROUP BY ?period ?group
+    ORDER BY ?period
+    """
+    return get_endpoint("wikidata"), query
 
 # NUEVA FUNCIÓN: Obtener Sitios del Patrimonio de la Humanidad (UNESCO)
+@sparql_query
 def get_unesco_world_heritage_sites(search_term=None, limit=50):
     """
     Obtiene sitios del Patrimonio de la Humanidad de la UNESCO desde Wikidata.
@@ -145,8 +321,9 @@ def get_unesco_world_heritage_sites(search_term=None, limit=50):
       {search_filter}
     }} LIMIT {limit}
     """
-    return run_sparql_query(WIKIDATA_ENDPOINT, query)
+    return get_endpoint("wikidata"), query
 
+@sparql_query
 def get_influencer_relationships(limit=10):
     """
     Obtiene relaciones de influencia donde el influencer es de Ecuador, desde DBpedia.
@@ -169,8 +346,9 @@ def get_influencer_relationships(limit=10):
     }}
     LIMIT {limit}
     """
-    return run_sparql_query(DBPEDIA_ENDPOINT, query)
+    return get_endpoint("dbpedia"), query
 
+@sparql_query
 def get_ecuadorian_musicians(search_term=None, limit=10):
     """
     Obtiene músicos ecuatorianos desde Wikidata.
@@ -191,4 +369,4 @@ def get_ecuadorian_musicians(search_term=None, limit=10):
     {search_filter}
     }} LIMIT {limit}
     """
-    return run_sparql_query(WIKIDATA_ENDPOINT, query)
\ No newline at end of file
+    return get_endpoint("wikidata"), query
\ No newline at end of file